@@ -0,0 +1,92 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+'''Compiled version of the `pyplist.convert.todict` loop.
+
+The tree is walked with the same explicit stack as the pure python version,
+but the kinds of `PlistElement` objects are compared as C integers and the
+values are stored with `PyDict_SetItem` and `PyList_Append`. `pyplist.convert`
+falls back to the pure python version when this extension is not built.
+'''
+from .namespace import KIND_KEY, KIND_STRING, KIND_DICT, KIND_ARRAY, KIND_INT, \
+KIND_TRUE, KIND_FALSE, KIND_FLOAT, KIND_DATA
+
+
+cdef int K_KEY = KIND_KEY
+cdef int K_STRING = KIND_STRING
+cdef int K_DICT = KIND_DICT
+cdef int K_ARRAY = KIND_ARRAY
+cdef int K_INT = KIND_INT
+cdef int K_TRUE = KIND_TRUE
+cdef int K_FALSE = KIND_FALSE
+cdef int K_FLOAT = KIND_FLOAT
+cdef int K_DATA = KIND_DATA
+
+
+cdef inline object _decode(int kind, object text, tuple decoders):
+    '''Decode the text of a non-directory 'plist' object'''
+    if kind == K_STRING or kind == K_KEY:   return text
+    elif kind == K_INT:                     return int(text)
+    elif kind == K_FLOAT:                   return float(text)
+    elif kind == K_TRUE:                    return True
+    elif kind == K_FALSE:                   return False
+    return decoders[kind](text)
+
+cdef inline object _getvalue(int kind, object element, tuple decoders,
+    bint decode_data):
+    '''Decode the cached text string. Typed values that were not converted to
+    a string yet are returned without a string round trip, see
+    `pyplist.convert._typedvalue`'''
+    text = element._text
+    if text is not None:    return _decode(kind, text, decoders)
+    raw = element._raw_text
+    if raw is None or (kind == K_DATA and not decode_data):
+        return _decode(kind, element.text, decoders)
+    if kind == K_INT:       return int(raw)
+    elif kind == K_FLOAT:   return float(raw)
+    return raw
+
+def todict(element, bint validate_dicts, tuple decoders, bint decode_data,
+    dicterror):
+    '''Reads a `PlistElement` tree and converts it to a `list`/`dict`. See
+    `pyplist.convert.todict`'''
+    cdef int kind = element._kind
+    cdef list stack, children
+    cdef Py_ssize_t i, n
+    cdef object container, node, k, v
+
+    # If the element is not a directory 'plist' element, wrap it inside an
+    # empty list
+    if kind > K_ARRAY:  return [element.text]
+
+    root = {} if kind == K_DICT else []
+    stack = [(root, element)]
+    while stack:
+        container, node = stack.pop()
+        children = node._children
+        n = len(children)
+        if type(container) is dict:
+            if validate_dicts: assert(not dicterror(node))
+            # Keys are followed by linked values in `PlistElement` subnode lists
+            for i in range(0, n - 1, 2):
+                k = children[i]
+                v = children[i + 1]
+                kind = v._kind
+                if kind <= K_ARRAY:
+                    value = {} if kind == K_DICT else []
+                    (<dict>container)[k._text] = value
+                    stack.append((value, v))
+                else:
+                    (<dict>container)[k._text] = _getvalue(kind, v, decoders,
+                        decode_data)
+        else:
+            for i in range(n):
+                v = children[i]
+                kind = v._kind
+                if kind <= K_ARRAY:
+                    value = {} if kind == K_DICT else []
+                    (<list>container).append(value)
+                    stack.append((value, v))
+                else:
+                    (<list>container).append(_getvalue(kind, v, decoders,
+                        decode_data))
+    # Return the constructed dict/list
+    return root
@@ -1,12 +1,72 @@
-from typing import Union, Dict, List, no_type_check
+from typing import Any, Union, Dict, List, Tuple, Optional, Callable, Iterator, \
+no_type_check
 from xml.etree.ElementTree import ParseError, tostring as etree_tostring
 from datetime import date, datetime
-from base64 import b64decode
+from threading import local
+# `pybase64` decodes 'NSData' objects with SIMD instructions when it is installed
+try:
+    from pybase64 import b64decode
+except ImportError:
+    from base64 import b64decode
 
 from . import APTypes
-from .tree import PlistElement, dateobj, isdirectory, isbool
+from .tree import PlistElement, dateobj
 from .parser import PlistXML, _dicterror, _dictattrstoxml
 from .namespace import *
+# Compiled version of the `todict` loop. It is built from '_todict.pyx' when
+# 'Cython' is installed
+try:
+    from ._todict import todict as _ctodict
+except ImportError:
+    _ctodict = None
+
+
+def _true(text: str) -> bool:    return True
+def _false(text: str) -> bool:   return False
+def _text(text: str) -> str:     return text
+
+# Decoders of non-directory 'plist' objects. Directory objects are walked
+# by `todict` and are never decoded through these tables
+_DECODERS: Dict[int, Callable[[str], APTypes]] = {
+    KIND_INT: int, KIND_FLOAT: float, KIND_DATE: dateobj,
+    KIND_TRUE: _true, KIND_FALSE: _false
+}
+# Jump tables indexed by `KIND_*` constants. `_DECODERS_DECODE` is used when
+# 'NSData' objects are decoded
+_DECODERS_RAW: Tuple[Callable[[str], APTypes], ...] = tuple(
+    _DECODERS.get(kind, _text) for kind in range(len(KIND_NAMES)))
+_DECODERS_DECODE: Tuple[Callable[[str], APTypes], ...] = tuple(
+    b64decode if kind == KIND_DATA else _DECODERS.get(kind, _text)
+    for kind in range(len(KIND_NAMES)))
+
+def _typedvalue(element: PlistElement, kind: int,
+    decoders: Tuple[Callable[[str], APTypes], ...], decode_data: bool) -> APTypes:
+    '''Return the value of a object whose typed `_raw_text` was not converted
+    to a string yet. The raw value is returned without formatting and decoding
+    it again, only undecoded 'NSData' objects need their base64 string'''
+    raw: Any = element._raw_text
+    if raw is None or (kind == KIND_DATA and not decode_data):
+        return decoders[kind](element.text) # type: ignore
+    if kind == KIND_INT:    return int(raw)
+    if kind == KIND_FLOAT:  return float(raw)
+    return raw
+
+_DECL_VER: str = '<?xml version="1.0"?>'
+_DECL_ENC: str = '<?xml version="1.0" encoding="UTF-8"?>'
+# Declarations that are added by `tostring`, linked to `xml_declaration` values
+_XML_DECLARATIONS: Dict[str, str] = {'ver': _DECL_VER, 'enc': _DECL_ENC}
+_PLIST_HEADER: str = '<plist>'
+
+# `PlistXML` objects are reused by `fromstring` and `fromfile`. Every thread
+# gets its own parser
+_parsers: local = local()
+
+def _parser() -> PlistXML:
+    '''Return the `PlistXML` object of the current thread'''
+    parser: Optional[PlistXML] = getattr(_parsers, 'parser', None)
+    if parser is None:
+        parser = _parsers.parser = PlistXML()
+    return parser
 
 
 def fromstring(string: str, validate_dicts: bool = True) -> PlistElement:
@@ -24,7 +84,7 @@ def fromstring(string: str, validate_dicts: bool = True) -> PlistElement:
     Returns
     -------
     PlistElement
-        When source string was successfully read and parsed by `expat`.
+        When source string was successfully read and parsed by `iterparse`.
 
     Raises
     ------
@@ -32,7 +92,7 @@ def fromstring(string: str, validate_dicts: bool = True) -> PlistElement:
         Raised when `string` parameter contains invalid 'xml'.
     '''
 
-    return PlistXML().parse(string, validate_dicts)
+    return _parser().parse(string, validate_dicts)
 
 def fromfile(filename: str, validate_dicts: bool = True) -> PlistElement:
     '''Reads a file and parses the file contents to an `PlistElement`
@@ -49,7 +109,7 @@ def fromfile(filename: str, validate_dicts: bool = True) -> PlistElement:
     Returns
     -------
     PlistElement
-        When file contents were successfully read and parsed by `expat`.
+        When file contents were successfully read and parsed by `iterparse`.
 
     Raises
     ------
@@ -57,7 +117,7 @@ def fromfile(filename: str, validate_dicts: bool = True) -> PlistElement:
         Raised if the target file contains invalid 'xml'.
     '''
 
-    return PlistXML().parsefile(filename, validate_dicts)
+    return _parser().parsefile(filename, validate_dicts)
 
 
 # To be removed when `mypy` implements recursive types
@@ -98,52 +158,61 @@ def todict(element: PlistElement, validate_dicts: bool=True,\
         'NSDictionary' was detected
     '''
 
-    # Root element of the `dict`/`list` tree
-    root: Union[Dict[str, APTypes], List[APTypes]]
-    if element.tag in DEFAULT_KEY_IDS['dict']:
-        # Check if the 'NSDictionary' is valid if the user choosed to check the
-        # 'NSDictionary' elements
-        if validate_dicts: assert(not _dicterror(element))
-        root = {}
-        # Keys are followed by linked values in `PlistElement` subnode lists
-        keys: List[PlistElement] = element._children[::2]
-        values: List[PlistElement] = element._children[1::2]
-        # Join two elements with same index from `keys` and `values` lists into
-        # tuples and iterate through them
-        for k, v in zip(keys, values):
-            # If the linked value is a dict or a list, parse it and link the
-            # result to the key
-            if isdirectory(v):
-                root[k.text] = todict(v, validate_dicts, decode_data)
-            # Else link the key to the value
-            elif decode_data and v.tag in DEFAULT_KEY_IDS['data']:
-                root[k.text] = b64decode(v.text)
-            elif v.tag in DEFAULT_KEY_IDS['int']:   root[k.text] = int(v.text)
-            elif v.tag in DEFAULT_KEY_IDS['float']: root[k.text] = float(v.text)
-            elif v.tag in DEFAULT_KEY_IDS['date']:  root[k.text] = dateobj(v.text)
-            elif isbool(v):
-                root[k.text] = True if v.tag in DEFAULT_KEY_IDS['true'] else False
-            else:                                   root[k.text] = v.text
-        # Return the constructed dict
-        return root
-    elif element.tag in DEFAULT_KEY_IDS['array']:
-        root = []
-        for e in element._children:
-            if isdirectory(e):
-                root.append(todict(e, validate_dicts, decode_data))
-            elif decode_data and e.tag in DEFAULT_KEY_IDS['data']:
-                root.append(b64decode(e.text))
-            elif e.tag in DEFAULT_KEY_IDS['int']:   root.append(int(e.text))
-            elif e.tag in DEFAULT_KEY_IDS['float']: root.append(float(e.text))
-            elif e.tag in DEFAULT_KEY_IDS['date']:  root.append(dateobj(e.text))
-            elif isbool(e):
-                root.append(True if e.tag in DEFAULT_KEY_IDS['true'] else False)
-            else:                                   root.append(e.text)
-        # Return the constructed list
-        return root
+    decoders: Tuple[Callable[[str], APTypes], ...] = \
+        _DECODERS_DECODE if decode_data else _DECODERS_RAW
+    if _ctodict is not None:
+        return _ctodict(element, validate_dicts, decoders, decode_data,
+            _dicterror)
+
+    kind: int = element._kind
     # If the element is not a directory 'plist' element, wrap it inside an
     # empty list
-    else:   return [element.text]
+    if kind > KIND_ARRAY:    return [element.text]
+
+    # Root element of the `dict`/`list` tree
+    root: Union[Dict[str, APTypes], List[APTypes]] = \
+        {} if kind == KIND_DICT else []
+    # Directory nodes that are waiting to be filled with their sub-nodes. An
+    # explicit stack is used instead of recursion, so deep trees do not hit the
+    # recursion limit
+    stack: List[Tuple[Union[Dict[str, APTypes], List[APTypes]], PlistElement]] = \
+        [(root, element)]
+    while stack:
+        container, node = stack.pop()
+        if isinstance(container, dict):
+            # Check if the 'NSDictionary' is valid if the user choosed to check
+            # the 'NSDictionary' elements
+            if validate_dicts: assert(not _dicterror(node))
+            # Keys are followed by linked values in `PlistElement` subnode lists.
+            # Zipping an iterator with itself pairs them without copying the
+            # subnode list
+            children: Iterator[PlistElement] = iter(node._children)
+            for k, v in zip(children, children):
+                kind = v._kind
+                # If the linked value is a dict or a list, link an empty one to
+                # the key and fill it later. Else decode the value and link it
+                # to the key. The cached `_text` strings are read directly,
+                # typed values that were not read yet are used without a
+                # string round trip
+                if kind <= KIND_ARRAY:
+                    container[k._text] = {} if kind == KIND_DICT else []
+                    stack.append((container[k._text], v))
+                else:
+                    text = v._text
+                    container[k._text] = _typedvalue(v, kind, decoders,
+                        decode_data) if text is None else decoders[kind](text)
+        else:
+            for e in node._children:
+                kind = e._kind
+                if kind <= KIND_ARRAY:
+                    container.append({} if kind == KIND_DICT else [])
+                    stack.append((container[-1], e))
+                else:
+                    text = e._text
+                    container.append(_typedvalue(e, kind, decoders,
+                        decode_data) if text is None else decoders[kind](text))
+    # Return the constructed dict/list
+    return root
 
 def tostring(element: PlistElement, plist_attrs: Dict[str, str] = {},\
     xml_declaration: str = '', short_empty_elements: bool = True) -> str:
@@ -172,19 +241,21 @@ def tostring(element: PlistElement, plist_attrs: Dict[str, str] = {},\
         successfully.
     '''
 
-    plist_header: str = '<plist%s>' % _dictattrstoxml(plist_attrs)
+    # Most property lists do not have any '<plist>' attributes
+    plist_header: str = '<plist%s>' % _dictattrstoxml(plist_attrs) \
+        if plist_attrs else _PLIST_HEADER
     # Note that `# type: ignore` is being used bellow to ignore warnings that
     # are being caused because of duck-typing
     raw_content: str = etree_tostring(element, encoding='unicode',
         short_empty_elements=short_empty_elements) # type: ignore
-    declaration: str = ''
-    if xml_declaration == 'ver':
-        declaration = '<?xml version="1.0"?>'
-    elif xml_declaration == 'enc':
-        declaration = '<?xml version="1.0" encoding="UTF-8"?>'
+    declaration: str = _XML_DECLARATIONS.get(xml_declaration, '')
     # Build the final string
     return '%s%s%s</plist>' % (declaration, plist_header, raw_content)
 
+def _canonsubclass(t: type) -> str:
+    '''Return the tag of new objects for a subclass of a supported python type'''
+    return next(CANON_BY_TYPE[base] for base in t.__mro__ if base in CANON_BY_TYPE)
+
 # To be removed when `mypy` implements recursive types
 @no_type_check
 def fromdict(source: Union[Dict[str, APTypes], List[APTypes]]) -> PlistElement:
@@ -213,36 +284,40 @@ def fromdict(source: Union[Dict[str, APTypes], List[APTypes]]) -> PlistElement:
     root: PlistElement
     if isinstance(source, dict):
         # Define root element as a 'NSDictionary' if `source` is a `dict`
-        root = PlistElement(DEFAULT_KEY_IDS['dict'][0])
+        root = PlistElement(CANON_BY_TYPE[dict])
         for k,v in source.items():
+            t = type(v)
+            canon = CANON_BY_TYPE.get(t)
             # If the value is a `dict` or a `list`, parse it and link the
             # result to the target key
-            if isinstance(v, (list, dict)): root[k] = fromdict(v)
-            elif isinstance(v, bool):
-                root[k] = PlistElement(
-                    DEFAULT_KEY_IDS['true' if v else 'false'][0])
+            if t is dict or t is list:  root[k] = fromdict(v)
             # Link python type to 'plist' type tag definitions
+            elif canon is not None:     root[k] = PlistElement(canon, v)
+            elif t is bool:             root[k] = PlistElement(CANON_BOOL[v])
+            # Subclasses of the supported types are checked last
+            elif isinstance(v, (list, dict)): root[k] = fromdict(v)
             elif isinstance(v, (int, float, str, bytes, bytearray, date, datetime)):
-                root[k] = PlistElement(
-                    DEFAULT_KEY_IDS[TYPE_TO_KEYNAME[type(v)]][0], v)
+                root[k] = PlistElement(_canonsubclass(t), v)
             else: raise ValueError('`v` is a `%s`, not `dict`, `list`, `int`, \
 `str`, `bytes`, `bytearray`, `datetime.date` or `datetime.datetme`' % v)
         # Return the fully constructed `PlistElement`
         return root
     elif isinstance(source, list):
         # Define root element as a 'NSArray' if `source` parameter is a `list`
-        root = PlistElement(DEFAULT_KEY_IDS['array'][0])
+        root = PlistElement(CANON_BY_TYPE[list])
         for v in source:
+            t = type(v)
+            canon = CANON_BY_TYPE.get(t)
             # If the value is a `dict` or a `list`, parse it, and append the
             # result to the root 'NSArray' element
-            if isinstance(v, (list, dict)): root.append(fromdict(v))
-            elif isinstance(v, bool):
-                root.append(PlistElement(
-                    DEFAULT_KEY_IDS['true' if v else 'false'][0]))
+            if t is dict or t is list:  root.append(fromdict(v))
             # Link python type to 'plist' type tag definitions
+            elif canon is not None:     root.append(PlistElement(canon, v))
+            elif t is bool:             root.append(PlistElement(CANON_BOOL[v]))
+            # Subclasses of the supported types are checked last
+            elif isinstance(v, (list, dict)): root.append(fromdict(v))
             elif isinstance(v, (int, float, str, bytes, bytearray, date, datetime)):
-                root.append(PlistElement(
-                    DEFAULT_KEY_IDS[TYPE_TO_KEYNAME[type(v)]][0], v))
+                root.append(PlistElement(_canonsubclass(t), v))
             else: raise ValueError('`v` is `%s`, not `dict`, `list`, `int`, \
  `str`, `bytes`, `bytearray`, `datetime.date` or `datetime.datetme`' % v)
         # Return the fully constructed `PlistElement`
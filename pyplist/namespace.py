@@ -1,4 +1,4 @@
-from typing import Dict, List
+from typing import Dict, List, Tuple
 from itertools import chain as itt_chain
 from datetime import date, datetime
 
@@ -14,6 +14,14 @@ DEFAULT_KEY_IDS: Dict[str, List[str]] = {
 DEFAULT_KEYS: List[str] =  ['key', 'string', 'data', 'dict', 'array', 'integer',
                             'true', 'false', 'real', 'date']
 
+# Integer kinds of 'plist' objects. `KIND_NAMES` holds the `DEFAULT_KEY_IDS` key
+# of every kind in the same order. Directory kinds come first and are followed
+# by 'NSBool' kinds, so both can be detected with a single range comparison
+KIND_NAMES: Tuple[str, ...] = ('dict', 'array', 'true', 'false', 'key', 'string',
+                               'data', 'int', 'float', 'date')
+KIND_DICT, KIND_ARRAY, KIND_TRUE, KIND_FALSE, KIND_KEY, KIND_STRING, KIND_DATA, \
+KIND_INT, KIND_FLOAT, KIND_DATE = range(len(KIND_NAMES))
+
 TYPE_TO_KEYNAME = {
     int: 'int', str: 'string',
     bytes: 'data', bytearray: 'data',
@@ -21,6 +29,34 @@ TYPE_TO_KEYNAME = {
     datetime: 'date'
 }
 
+# Tables that are derived from `DEFAULT_KEY_IDS`. They are being rebuilt in
+# place by `_rebuildtables`, so modules that have imported them always see the
+# current namespace
+
+# Reverse map that links every tag to the kind of the 'plist' object. It
+# replaces linear scans through the alias lists in `DEFAULT_KEY_IDS`
+TAG_KIND: Dict[str, int] = {}
+# Links python types (including `dict` and `list`) to the tag that is used when
+# creating new `PlistElement` objects
+CANON_BY_TYPE: Dict[type, str] = {}
+# Tags of new 'NSBool' objects, indexed by the `bool` value itself
+CANON_BOOL: List[str] = []
+
+
+def _rebuildtables() -> None:
+    '''Rebuild the tables that are derived from `DEFAULT_KEY_IDS`'''
+    TAG_KIND.clear()
+    TAG_KIND.update({tag: kind for kind, name in enumerate(KIND_NAMES)
+                     for tag in DEFAULT_KEY_IDS.get(name, [])})
+    CANON_BY_TYPE.clear()
+    CANON_BY_TYPE.update({t: DEFAULT_KEY_IDS[name][0]
+                          for t, name in TYPE_TO_KEYNAME.items()})
+    CANON_BY_TYPE[dict] = DEFAULT_KEY_IDS['dict'][0]
+    CANON_BY_TYPE[list] = DEFAULT_KEY_IDS['array'][0]
+    CANON_BOOL[:] = [DEFAULT_KEY_IDS['false'][0], DEFAULT_KEY_IDS['true'][0]]
+
+_rebuildtables()
+
 
 def updatekeys(newdefs: Dict[str, List[str]]) -> None:
     '''Update the namespace for 'plist' tag definitions.
@@ -40,4 +76,5 @@ def updatekeys(newdefs: Dict[str, List[str]]) -> None:
 
     # Solution for all python 3.x versions
     DEFAULT_KEY_IDS.update(newdefs)
-    DEFAULT_KEYS[:] = list(itt_chain(*DEFAULT_KEY_IDS.values()))
\ No newline at end of file
+    DEFAULT_KEYS[:] = list(itt_chain(*DEFAULT_KEY_IDS.values()))
+    _rebuildtables()
\ No newline at end of file
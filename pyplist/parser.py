@@ -1,9 +1,34 @@
-from typing import Dict, Union, List, no_type_check
-from re import compile as re_compile, match as re_match
-from xml.parsers.expat import ParserCreate, error as expat_error
+from typing import Dict, Union, List, Optional, Iterable, Iterator, Tuple, \
+Any, no_type_check
+from xml.sax.saxutils import quoteattr
+# `pybase64` validates base64 strings faster than the standard library
+try:
+    from pybase64 import b64decode
+except ImportError:
+    from base64 import b64decode
+# Prefer `lxml` when it is installed, `libxml2` walks the tags in C. The
+# `ElementTree` version of `iterparse` has the same interface and is used as a
+# fallback
+try:
+    from lxml.etree import iterparse, XMLPullParser, XMLSyntaxError as ParseError
+    _ITERPARSE_OPTIONS: Dict[str, bool] = {
+        'huge_tree': True, 'remove_comments': True, 'remove_pis': True
+    }
+    _LXML: bool = True
+except ImportError:
+    from xml.etree.ElementTree import iterparse, XMLPullParser, \
+    ParseError # type: ignore
+    _ITERPARSE_OPTIONS = {}
+    _LXML = False
+
+# Size of the chunks that are fed to the parser when parsing strings
+_BUFFER_SIZE: int = 65536
+# Directory objects are created on 'start' events, so their sub-nodes can be
+# appended to them directly
+_EVENTS: Tuple[str, str] = ('start', 'end')
 
 from . import APTypes
-from .tree import PlistElement, dateobj
+from .tree import PlistElement, dateobj, _object_setattr
 from .namespace import *
 
 
@@ -11,122 +36,190 @@ def _dicterror(element: PlistElement) -> bool:
     '''Check if a 'NSDictionary' is valid. `True` is returned when a error is
     found.'''
 
-    if not element.tag in DEFAULT_KEY_IDS['dict']:
+    if TAG_KIND.get(element.tag) != KIND_DICT:
         raise ValueError('`element` is not a dict')
-    if len(element._children) == 0:     return False
-    keys: List[PlistElement] = element._children[::2]
-    values: List[PlistElement] = element._children[1::2]
-    if len(keys) != len(values):        return True
+    # Every key needs a linked value
+    if len(element._children) % 2:      return True
     # Check if all keys are valid Plist keys and check if values that those
-    # keys point at, are not Plist keys. If not return False
-    validks: bool = all([key.tag in DEFAULT_KEY_IDS['key'] for key in keys])
-    validvs: bool = all([value.tag not in DEFAULT_KEY_IDS['key'] for value in values])
-    return (not validks or not validvs)
+    # keys point at, are not Plist keys. Stop at the first invalid pair
+    children: Iterator[PlistElement] = iter(element._children)
+    for key, value in zip(children, children):
+        if TAG_KIND.get(key.tag) != KIND_KEY or TAG_KIND.get(value.tag) == KIND_KEY:
+            return True
+    return False
 
 def _dictattrstoxml(input: Dict[str, str]) -> str:
     '''Convert dictionary attributes to string 'xml' attributes'''
 
     if not input: return ''
-    # Escape `"` and `'` with \
-    return ''.join([' %s="%s"' % (k, v.replace('"', '\\"'))\
-        for k,v in input.items()])
+    # `quoteattr` escapes '&', '<', '>' and quotes, and adds the surrounding
+    # quotes itself
+    if len(input) == 1:
+        (k, v), = input.items()
+        return ' %s=%s' % (k, quoteattr(v))
+    return ''.join([' %s=%s' % (k, quoteattr(v)) for k,v in input.items()])
 
 
 class PlistXML():
     '''Parser class that implements `fromstring` and `fromfile` methods by using
-    the `expat` parser.
+    `iterparse` from `lxml` or `xml.etree.ElementTree`.
 
     Attributes
     ----------
     _parser : object
-        Fully constructed expat parser object that has all member functions
-        linked to it.
+        The `iterparse` function that is used to walk through files. Strings
+        are fed to a `XMLPullParser` instead.
     _orderelementlist : List[PlistElement]
-        A ordered list that contains every directory node. When a new
-        `PlistElement` object has been parsed, it is appended to the end of this
-        list and if the parsed `PlistElement` object is not a directory node, it
-        is being removed from the list and added as a sub-node to the
-        `PlistElement` before the removed element.
+        A ordered list that contains every open directory node. A directory
+        node is appended to the end of this list when its opening tag was
+        parsed. Non-directory nodes are created when their closing tag was
+        parsed and are added directly as sub-nodes to the last element of the
+        list. Closed directory nodes are removed from the list and added to the
+        `PlistElement` before them.
+    _rootclosed : bool
+        Set when the root element was closed. Any element after it is a second
+        root and is rejected.
     '''
 
     def __init__(self) -> None:
-        # Try to import 'expat' module from different directories
-
-        # Build the expat parser object by linking the handling functions to it
-        parser = ParserCreate(None, "}")
-        parser.DefaultHandlerExpand = None
-        parser.StartElementHandler = self._start
-        parser.EndElementHandler = self._end
-        parser.CharacterDataHandler = self._data
-
-        # Thanks to 'xuanyuanzhiyuan' (https://stackoverflow.com/a/8571649)
-        self._b64check = re_compile(
-            r'^([A-Za-z0-9+/]{4})*([A-Za-z0-9+/]{3}=|[A-Za-z0-9+/]{2}==)?$')
-        self._parser = parser
+        self._parser = iterparse
         self._orderelementlist: List[PlistElement] = []
+        self._rootclosed: bool = False
+
+    def reset(self) -> None:
+        '''Clear the state that is left from the last parsed source, so the
+        same parser object can be reused'''
+        self._orderelementlist = []
+        self._rootclosed = False
 
     def parse(self, source: str, validate_dicts: bool = True) -> PlistElement:
-        '''Read the string and parse it using `expat`'''
+        '''Read the string and parse it using `iterparse`'''
+        self.reset()
         self._validate_dicts = validate_dicts
-        try:                        self._parser.Parse(source, True)
-        except expat_error as e:    raise SyntaxError("String cannot be parsed")
+        try:
+            self._feed(source)
+            root: PlistElement = self._orderelementlist[0]
+        except ParseError as e:     raise SyntaxError("String cannot be parsed")
+        # A reused parser must not keep the last parsed tree alive
+        finally:                    self.reset()
 
-        # Return root
-        return self._orderelementlist[0]
+        return root
 
     def parsefile(self, filename: str, validate_dicts: bool = True) -> PlistElement:
-        '''Read the target file and parse it using `expat`'''
+        '''Read the target file and parse it using `iterparse`'''
+        self.reset()
         self._validate_dicts = validate_dicts
-        buffer: str = open(filename, 'r').read()
-
-        try:                        self._parser.Parse(buffer, True)
-        except expat_error as e:    raise SyntaxError("'%s' cannot be parsed" % filename)
-
-        # Return root
-        return self._orderelementlist[0]
+        # The file is read in chunks by the parser itself. It is not decoded
+        # or loaded into memory as a whole
+        try:
+            self._iterparse(filename)
+            root: PlistElement = self._orderelementlist[0]
+        except ParseError as e:     raise SyntaxError("'%s' cannot be parsed" % filename)
+        # A reused parser must not keep the last parsed tree alive
+        finally:                    self.reset()
+
+        return root
+
+    def _iterparse(self, filename: str) -> None:
+        '''Walk through the 'start' and 'end' events of the target file'''
+        self._events(self._parser(filename, events=_EVENTS, **_ITERPARSE_OPTIONS))
+
+    def _feed(self, source: str) -> None:
+        '''Feed the string to a pull parser in `_BUFFER_SIZE` chunks, so no
+        encoded copy of the whole string is made'''
+        parser = XMLPullParser(events=_EVENTS, **_ITERPARSE_OPTIONS)
+        for i in range(0, len(source), _BUFFER_SIZE):
+            parser.feed(source[i:i + _BUFFER_SIZE])
+            self._events(parser.read_events())
+        parser.close()
+        self._events(parser.read_events())
+
+    def _events(self, events: Iterable[Tuple[str, Any]]) -> None:
+        '''Handle parsed 'start' and 'end' events. Parsed elements are cleared
+        when they are closed. With `lxml` the cleared siblings before them are
+        also removed from their parent, so the parsed tree stays as small as
+        the open path. `ElementTree` elements do not know their parents, there
+        the cleared elements stay linked until the root is closed'''
+        for event, elem in events:
+            if event == 'start':
+                self._start(elem.tag, elem.attrib)
+            else:
+                self._end(elem.tag, elem.attrib, elem.text, len(elem))
+                elem.clear()
+                if _LXML:
+                    while elem.getprevious() is not None:
+                        del elem.getparent()[0]
 
     def _start(self, tag: str, attr_list: Dict[str, str]) -> None:
-        '''Parser handler method that creates new objects when a opening tag
-        was parsed by `expat`'''
+        '''Parser handler method that creates new directory objects when a
+        opening tag was parsed. Other objects are created when they are closed'''
+        if self._rootclosed:
+            raise SyntaxError("Plist cannot have more than one root element")
+        kind: int = TAG_KIND.get(tag, KIND_STRING)
+        if kind <= KIND_ARRAY:
+            self._orderelementlist.append(PlistElement(tag, \
+                attribs=dict(attr_list), parsedobj=True))
+
+    def _end(self, tag: str, attr_list: Dict[str, str], text: Optional[str],
+        children: int = 0) -> None:
+        '''Parser handler method that closes the object, sets its inner text and
+        appends it to its parent. `children` is the number of sub-nodes of the
+        parsed tag'''
         # Ignore `plist` tag. It is intended to be a identificator
         if tag.lower() == "plist":  return
-        self._orderelementlist.append(PlistElement(tag, \
-            attribs=attr_list, parsedobj=True))
-    def _end(self, tag: str) -> None:
-        '''Parser handler method that closes and appends the object to its
-        parent'''
-
-        if tag in DEFAULT_KEY_IDS['dict'] and self._validate_dicts:
-            if _dicterror(self._orderelementlist[-1]):
-                raise SyntaxError("Parsed 'NSDictionary' is not valid")
-
-        # If there is a parent element add the last element to it
-        if len(self._orderelementlist) > 1:
-            tmpobj: PlistElement = self._orderelementlist.pop()
-            self._orderelementlist[-1]._children.append(tmpobj)
-
-            if self._orderelementlist[-1].tag in DEFAULT_KEY_IDS['dict'] \
-                and tmpobj.tag in DEFAULT_KEY_IDS['key']:
-                # Link the key to the element after the key that is supposed to
-                # be the hypotetical value. When the linked value is a key and
-                # `_validate_dicts` is set to False, errors may occur. Set
-                # `_validate_dicts` to False only if you know that the property
-                # list is valid
-                self._orderelementlist[-1]._dictitems[tmpobj.text] = self._orderelementlist[-1]._children.index(tmpobj) + 1 # type: ignore
-    def _data(self, data: str) -> None:
-        '''Parser handler method that appends inner xml text to `PlistElement`
-        `text` attribute'''
-
-        data = data.strip()
-        # Ignore empty data
-        if data == '':    return
-        target: PlistElement = self._orderelementlist[-1]
-        if target.tag in DEFAULT_KEY_IDS['date']:
-            target.text = dateobj(data)
-            return
-        elif target.tag in DEFAULT_KEY_IDS['data']:
-            if not re_match(self._b64check, data):
-                raise ValueError('`%s` is not valid base64' % data)
-            super(PlistElement, target).__setattr__('text', data)
+        if self._rootclosed:
+            raise SyntaxError("Plist cannot have more than one root element")
+        kind: int = TAG_KIND.get(tag, KIND_STRING)
+
+        # The inner text is buffered by the parser and read once per element
+        if kind <= KIND_ARRAY:
+            element: PlistElement = self._orderelementlist.pop()
+            # Ignore the formatting between sub-nodes
+            if text is not None and not text.isspace():
+                element.text = text
+            if kind == KIND_DICT and self._validate_dicts:
+                if _dicterror(element):
+                    raise SyntaxError("Parsed 'NSDictionary' is not valid")
+        else:
+            # Leaves are never opened, so their sub-nodes were appended to the
+            # wrong parent or became the root
+            if children:
+                raise SyntaxError("`%s` cannot have any sub-nodes" % tag)
+            element = PlistElement(tag, attribs=dict(attr_list), parsedobj=True)
+            # `str.strip` returns the same string object when there is nothing
+            # to strip, so it does not allocate on the common path. Whitespace
+            # is stripped from every kind, since keys and dates would not match
+            # otherwise
+            text = None if text is None else text.strip()
+            if not text:                pass
+            elif kind == KIND_DATE:
+                element.text = dateobj(text)
+            elif kind == KIND_DATA:
+                # `plistlib` and Xcode wrap long base64 strings across indented
+                # lines, the whitespace inside is removed before validating
+                text = ''.join(text.split())
+                # The base64 string is validated in C. `binascii.Error` is a
+                # subclass of `ValueError`
+                try:                b64decode(text, validate=True)
+                except ValueError:  raise ValueError('`%s` is not valid base64' % text)
+                _object_setattr(element, '_text', text)
+                _object_setattr(element, '_raw_text', text)
+            else:                       element.text = text
+
+        # The root element stays in the ordered list
+        if not self._orderelementlist:
+            self._orderelementlist.append(element)
+            self._rootclosed = True
             return
-        target.text = data
\ No newline at end of file
+        parent: PlistElement = self._orderelementlist[-1]
+        # A non-directory root is followed by a sibling
+        if parent._kind > KIND_ARRAY:
+            raise SyntaxError("`%s` cannot have any sub-nodes" % parent.tag)
+        parent._children.append(element)
+        if kind == KIND_KEY and parent._kind == KIND_DICT:
+            # Link the key to the element after the key that is supposed to be
+            # the hypotetical value. When the linked value is a key and
+            # `_validate_dicts` is set to False, errors may occur. Set
+            # `_validate_dicts` to False only if you know that the property list
+            # is valid
+            parent._dictitems[element.text] = len(parent._children) # type: ignore
@@ -0,0 +1,98 @@
+from typing import Dict, List, Union, Callable, Any, no_type_check
+from datetime import date, datetime
+# `pybase64` decodes 'NSData' objects with SIMD instructions when it is installed
+try:
+    from pybase64 import b64decode
+except ImportError:
+    from base64 import b64decode
+
+from . import APTypes
+from .tree import PlistElement, dateobj
+from .namespace import *
+
+
+# Expressions that convert a non-directory `PlistElement` to the python type
+# of a schema. `%s` is replaced with the expression of the target element
+_CONVERTERS: Dict[type, str] = {
+    int: 'int(%s.text)', float: 'float(%s.text)', str: '%s.text',
+    bytes: 'b64decode(%s.text)', date: 'dateobj(%s.text)',
+    datetime: 'dateobj(%s.text)', bool: '(%s._kind == KIND_TRUE)'
+}
+
+
+def _expr(schema: Any, target: str, functions: List[str]) -> str:
+    '''Return the expression that converts the `target` element by `schema`'''
+    if isinstance(schema, (dict, list)):
+        return '%s(%s)' % (_function(schema, functions), target)
+    try:
+        return _CONVERTERS[schema] % target
+    except (KeyError, TypeError):
+        raise ValueError('`%r` is not a supported schema type' % (schema,))
+
+def _function(schema: Union[Dict[str, Any], List[Any]], functions: List[str]) -> str:
+    '''Generate the source of a function that converts a 'NSDictionary' or a
+    'NSArray' by `schema`. The source is added to `functions` and the name of
+    the function is returned'''
+    index: int = len(functions)
+    name: str = '_f%d' % index
+    # Reserve the position, so the functions of sub-nodes get other names
+    functions.append('')
+    if isinstance(schema, dict):
+        for key in schema:
+            if not isinstance(key, str):
+                raise ValueError('`%r` is not a `str` key' % (key,))
+        # Values are found by their keys, so the order of the keys inside the
+        # parsed 'NSDictionary' does not matter
+        items: str = ', '.join(['%r: %s' % (key, _expr(value, 'c[d[%r]]' % key,
+            functions)) for key, value in schema.items()])
+        functions[index] = 'def %s(e):\n    c = e._children\n' \
+            '    d = e._dictitems\n    return {%s}\n' % (name, items)
+    else:
+        if len(schema) != 1:
+            raise ValueError('List schemas must contain exactly one item schema')
+        functions[index] = 'def %s(e):\n    return [%s for x in ' \
+            'e._children]\n' % (name, _expr(schema[0], 'x', functions))
+    return name
+
+# To be removed when `mypy` implements recursive types
+@no_type_check
+def compile_todict(schema: Union[Dict[str, Any], List[Any]]) \
+-> Callable[[PlistElement], Union[Dict[str, APTypes], List[APTypes]]]:
+    '''Generates a `todict` function that is specialized for property lists
+    with a known structure. The generated function does not look up the kinds
+    of the `PlistElement` objects, every value is converted by straight-line
+    code.
+
+    Parameters
+    ----------
+    schema : Union[Dict[str, _this_], List[_this_]]
+        A `dict` or a `list` that describes the structure of the property list.
+        `dict` schemas link keys to the schemas of their values. Keys that are
+        not in the schema are ignored. `list` schemas contain a single schema
+        that is used for every item of the 'NSArray'. Non-directory values are
+        described by the python types `int`, `float`, `str`, `bool`, `bytes`
+        (decoded 'NSData'), `datetime.date` or `datetime.datetime`.
+
+    Returns
+    -------
+    Callable[[PlistElement], Union[Dict[str, APTypes], List[APTypes]]]
+        A function that converts a `PlistElement` tree following `schema` to
+        a `dict`/`list`. The tree is not validated; a `KeyError` is raised
+        when a key of the schema is missing.
+
+    Raises
+    ------
+    ValueError
+        Raised when `schema` contains an unsupported type, a non-string key or
+        a `list` that does not contain exactly one schema.
+    '''
+
+    if not isinstance(schema, (dict, list)):
+        raise ValueError('`schema` parameter is not a `dict` or a `list`')
+    functions: List[str] = []
+    name: str = _function(schema, functions)
+    namespace: Dict[str, Any] = {
+        'b64decode': b64decode, 'dateobj': dateobj, 'KIND_TRUE': KIND_TRUE
+    }
+    exec(compile('\n'.join(functions), '<schema>', 'exec'), namespace)
+    return namespace[name]
@@ -1,31 +1,104 @@
 from __future__ import annotations
-from typing import List, Dict, Union, Generator, ItemsView, Optional, \
-Tuple, Any, no_type_check
-from base64 import b64encode, b64decode
+from typing import List, Dict, Union, Generator, Iterator, ItemsView, Optional, \
+Tuple, Any, Callable, no_type_check
+# `pybase64` encodes 'NSData' objects with SIMD instructions and returns the
+# `str` directly when it is installed
+try:
+    from pybase64 import b64encode_as_string as _b64encode
+except ImportError:
+    from base64 import b64encode
+
+    def _b64encode(s: Union[bytes, bytearray]) -> str:
+        return b64encode(s).decode("ASCII")
 from datetime import date, datetime
+from functools import lru_cache
 
 from . import APTypes
 from .namespace import *
 
 
-def dateobj(source: str) -> Union[date, datetime]:
+def _dateobj(source: str) -> Union[date, datetime]:
     '''Parse `date` or `datetime` string to it's corresponding class'''
-    try:
-        return date.fromisoformat(source)
-    except ValueError:
-        return datetime.fromisoformat(source)
+    # ISO dates are at most 10 characters long, so `datetime` strings do not
+    # pay for a failed `date.fromisoformat` call
+    if len(source) <= 10:
+        try:
+            return date.fromisoformat(source)
+        except ValueError:
+            pass
+    return datetime.fromisoformat(source)
+
+# The same dates are often repeated inside property lists. `date` and
+# `datetime` objects are immutable, so parsed dates can be shared
+dateobj = lru_cache(maxsize=4096)(_dateobj)
 
 def isbool(element: PlistElement) -> bool:
-    '''Returns `True` if the `element.tag` is defined inside 'NSBool' tag
-    definitions'''
+    '''Returns `True` if the `element` is a 'NSBool' object. The kind is the
+    one looked up when the `element` was created, tags added later with
+    `updatekeys` do not change it'''
 
-    return element.tag in (DEFAULT_KEY_IDS['true'] + DEFAULT_KEY_IDS['false'])
+    return KIND_TRUE <= element._kind <= KIND_FALSE
 
 def isdirectory(element: PlistElement) -> bool:
-    '''Returns `True` if the `element.tag` is defined inside 'NSArray' and
-    'NSDictionary' tag definitions'''
+    '''Returns `True` if the `element` is a 'NSArray' or a 'NSDictionary'
+    object. The kind is the one looked up when the `element` was created,
+    tags added later with `updatekeys` do not change it'''
+
+    return element._kind <= KIND_ARRAY
+
+# Attributes that do not need the checks of `PlistElement.__setattr__` are set
+# without creating a `super` object on every call
+_object_setattr: Callable[[object, str, Any], None] = object.__setattr__
+
+# Validators that check a new `text` value of a `PlistElement` and return the
+# typed value that is stored until the string is needed
+def _notext(element: PlistElement, value: Any) -> Any:
+    raise SyntaxError("`%s` cannot have a `text` attribute" % element.tag)
+
+def _datetext(element: PlistElement, value: Any) -> Any:
+    if not isinstance(value, (date, datetime)):
+        raise ValueError("`value` parameter must be `date` or\
+ `datetime`, not `%s` when changing `text` attribute in a 'NSDate' object" % type(value))
+
+    return value
+
+def _numbertext(element: PlistElement, value: Any) -> Any:
+    # Numbers do not need to be validated by a `float` call
+    t: type = type(value)
+    if t is int or t is float:  return value
+    if not isinstance(value, (int, float, str)):
+        raise ValueError("`value` parameter must be `int`, `float`\
+or `str` number, not `%s` when changing `text` attribute on 'NSNumber' object" % type(value))
+    try:
+        float(value)
+    except ValueError:
+        raise ValueError('`%s` is not a valid `int` or `float`' % value)
+
+    return value
+
+def _datatext(element: PlistElement, value: Any) -> Any:
+    if not isinstance(value, (bytearray, bytes)):
+        raise ValueError("`value` parameter must be `bytes` or\
+ `bytearray`, not `%s` when changing `text` attribute on 'NSData' object" % type(value))
+
+    # A `bytearray` can be changed before the string is created
+    return bytes(value)
 
-    return element.tag in (DEFAULT_KEY_IDS['array'] + DEFAULT_KEY_IDS['dict'])
+def _isoformat(value: Union[date, datetime]) -> str:
+    return value.isoformat()
+
+# Jump tables indexed by `KIND_*` constants. 'NSKey' and 'NSString' objects
+# keep the value as it is. The kinds of the tags are not changed by
+# `updatekeys`, so the tables do not have to be rebuilt
+_TEXT_VALIDATORS: Tuple[Optional[Callable[[PlistElement, Any], Any]], ...] = (
+    _notext, _notext, _notext, _notext, None, None, _datatext, _numbertext,
+    _numbertext, _datetext
+)
+# Converters of the stored typed values to `text` strings. They are called
+# when `text` is read for the first time
+_TEXT_FORMATTERS: Tuple[Optional[Callable[[Any], str]], ...] = (
+    None, None, None, None, None, None, _b64encode, str, str, _isoformat
+)
 
 
 class PlistElement(object):
@@ -46,9 +119,10 @@ class PlistElement(object):
         'NSDictionary' and 'NSArray'. `text` is being converted to an 'base64'
         string if the type is `bytes` or `bytearray`. If `text` is `date` or
         `datetime`, the `isoformat` method is being used to convert it to string
-    attribs: Dict[str, str] = {}
+    attribs: Optional[Dict[str, str]] = None
         `attribs` are the parameters defined inside an 'xml/plist' tag and where
-        the keys and values are being separated by a '='.
+        the keys and values are being separated by a '='. A new empty `dict` is
+        used when it is `None`.
     parsedobj : bool = False
         `parsedobj` is an boolean identifier that is used to indicate that the
         `text` attribute is going to be set later by hand. It is intended to
@@ -57,14 +131,20 @@ class PlistElement(object):
 
     Attributes
     ----------
-    _dictitems : Dict[str, int]
+    _kind : int
+        `_kind` is the `KIND_*` constant of the `PlistElement` that is looked
+        up once from the `TAG_KIND` map when the object is created. Tags that
+        do not belong to any kind are treated as 'NSString' objects.
+    _dictitems : Optional[Dict[str, int]]
         `_dictitems` is used only when a `PlistElement` is a type of
         'NSDictionary'. It points a string key to the index of the corresponding
-        `PlistElement` in the `_children` list attribute.
-    _children : List[PlistElement]
+        `PlistElement` in the `_children` list attribute. It is `None` in
+        non-directory nodes.
+    _children : Union[List[PlistElement], Tuple[()]]
         `_children` is a list that holds all subnodes of a directory node.
         `_children` attribute is allowed only to be used if the `PlistElement`
-        is a type of 'NSDictionary' or 'NSArray'.
+        is a type of 'NSDictionary' or 'NSArray'. Non-directory nodes hold an
+        empty tuple.
     attrib : Dict[str, str]
         `attrib` holds the parameters that are being defined inside an
         'xml/plist' tag and where the keys and values are being separated by a
@@ -74,36 +154,56 @@ class PlistElement(object):
     text : str
         `text` is the text that is being placed between the opening and
         ending tag. It cannot be used if the `PlistElement` is not a directory
-        node, such as 'NSDictionary' or 'NSArray'.
+        node, such as 'NSDictionary' or 'NSArray'. `text` is created from
+        `_raw_text` when it is read for the first time.
+    _text : Optional[str]
+        `_text` caches the string of `text`. It is `None` until a typed value
+        stored in `_raw_text` is converted.
+    _raw_text : Any
+        `_raw_text` holds the value that `text` was set with, such as the
+        `date` of a 'NSDate' or the `bytes` of a 'NSData' object.
     tail : str
         Not used in this package, but reserved for a valid duck typed extension
         of `xml.etree.ElementTree.Element`
     '''
 
-    _dictitems: Dict[str, int] = {}
-    _children: List[PlistElement] = []
-    attrib : Dict[str, str] = {}
+    # Instances do not carry a `__dict__`, large trees hold a lot of nodes
+    __slots__ = ('_kind', '_dictitems', '_children', 'attrib', 'tag', 'tail',
+        '_text', '_raw_text', '__weakref__')
+
+    _kind: int
+    _dictitems: Optional[Dict[str, int]]
+    _children: Union[List[PlistElement], Tuple[()]]
+    attrib : Dict[str, str]
 
-    tag: str = ''
-    tail: str = ''
-    # `text` is only `str`. `date` and `datetime` are being wrapped inside to
-    # prevent `mypy` warnings when trying to set `.text` attribute with a
-    # `date` or `datetime` inside a 'NSDate' object. `__setattr__` is being
-    # overloaded and `date` and `datetime` objects are being converted to string
-    # with `isoformat` method
-    text: Union[str, date, datetime] = ''
+    tag: str
+    tail: str
+    _text: Optional[str]
+    _raw_text: Any
 
     def __init__(self, PLIST_TAG: str, text: APTypes = "",
-        attribs : Dict[str, str] = {}, parsedobj: bool = False) -> None:
+        attribs : Optional[Dict[str, str]] = None, parsedobj: bool = False) -> None:
         if not PLIST_TAG in DEFAULT_KEYS:
             raise ValueError("`%s` not in current 'namespace'" % PLIST_TAG)
-        if not isinstance(attribs, dict):
+        if attribs is None:     attribs = {}
+        elif not isinstance(attribs, dict):
             raise ValueError("`attribs` parameter must be `dict`, not `%s`" %
             attribs.__class__.__name__)
-        self._dictitems = {}
-        self._children = []
-        self.attrib = attribs
-        super().__setattr__('tag', PLIST_TAG)
+        kind: int = TAG_KIND.get(PLIST_TAG, KIND_STRING)
+        if kind <= KIND_ARRAY:
+            _object_setattr(self, '_dictitems', {})
+            _object_setattr(self, '_children', [])
+        else:
+            # Leaves share one empty tuple, so `len` and iterating still work
+            # without allocating containers for every leaf
+            _object_setattr(self, '_dictitems', None)
+            _object_setattr(self, '_children', ())
+        _object_setattr(self, 'attrib', attribs)
+        _object_setattr(self, 'tag', PLIST_TAG)
+        _object_setattr(self, '_kind', kind)
+        _object_setattr(self, 'tail', '')
+        _object_setattr(self, '_text', '')
+        _object_setattr(self, '_raw_text', '')
 
         # Ignore text errors if the object is created from parsing a string/file
         if parsedobj:   return
@@ -133,40 +233,44 @@ class PlistElement(object):
             Raised when trying to set the `text` attribute with a invalid type
             value that is not acceptable for the current 'PlistElement' object
         '''
-        if attr == 'text' and not value in (None, ''):
-            if isdirectory(self) or isbool(self):
-                raise SyntaxError("`%s` cannot have a `text` attribute" % self.tag)
-
-            elif self.tag in DEFAULT_KEY_IDS['date']:
-                if not isinstance(value, (date, datetime)):
-                    raise ValueError("`value` parameter must be `date` or\
- `datetime`, not `%s` when changing `text` attribute in a 'NSDate' object" % type(value))
-
-                value = value.isoformat()
-
-            elif self.tag in DEFAULT_KEY_IDS['int'] + DEFAULT_KEY_IDS['float']:
-                if not isinstance(value, (int, float, str)):
-                    raise ValueError("`value` parameter must be `int`, `float`\
-or `str` number, not `%s` when changing `text` attribute on 'NSNumber' object" % type(value))
-                try:
-                    float(value)
-                except ValueError:
-                    raise ValueError('`%s` is not a valid `int` or `float`' % value)
-
-                value = str(value)
-
-            elif self.tag in DEFAULT_KEY_IDS['data']:
-                if not isinstance(value, (bytearray, bytes)):
-                    raise ValueError("`value` parameter must be `bytes` or\
- `bytearray`, not `%s` when changing `text` attribute on 'NSData' object" % type(value))
-
-                value = b64encode(value).decode("ASCII")
-
-
+        if attr == 'text':
+            text: Any = value
+            if not value in (None, ''):
+                validator: Optional[Callable[[PlistElement, Any], Any]] = \
+                    _TEXT_VALIDATORS[self._kind]
+                if validator is not None:
+                    value = validator(self, value)
+                    # Strings are kept, other typed values are converted
+                    # when `text` is read
+                    if type(value) is not str:  text = None
+            _object_setattr(self, '_raw_text', value)
+            _object_setattr(self, '_text', text)
+            return
         elif attr == 'tag':
             raise AttributeError('Cannot change the `tag` attribute. Replace\
  this element instead')
-        super().__setattr__(attr, value)
+        _object_setattr(self, attr, value)
+
+    @property
+    def text(self) -> Any:
+        '''The text between the opening and ending tag. Typed values are
+        converted to a string once and the string is cached'''
+        text: Optional[str] = self._text
+        if text is None and self._raw_text is not None:
+            # Set by `__setattr__` only when a formatter exists for the kind
+            text = _TEXT_FORMATTERS[self._kind](self._raw_text) # type: ignore
+            _object_setattr(self, '_text', text)
+        return text
+
+    def __getstate__(self) -> Dict[str, Any]:
+        '''Returns the values of the slots for `copy` and `pickle`'''
+        return {name: getattr(self, name) for name in _STATE_SLOTS}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        '''Restores the slots saved by `__getstate__`. `__setattr__` is not
+        used, since it forbids setting the `tag` attribute'''
+        for name, value in state.items():
+            _object_setattr(self, name, value)
 
     def __repr__(self) -> str:
         '''This method is called when trying to print a `PlistElement`.
@@ -180,12 +284,12 @@ or `str` number, not `%s` when changing `text` attribute on 'NSNumber' object" %
 
         return len(self._children)
 
-    def __iter__(self) -> Generator[PlistElement, None, None]:
+    def __iter__(self) -> Iterator[PlistElement]:
         '''This instance is being called when trying to iterate through a
         `PlistElement` in 'foreach' loops. It returns its sub-nodes if they
         exist.'''
 
-        return (x for x in list.__iter__(self._children))
+        return iter(self._children)
 
     def items(self) -> ItemsView[str, str]:
         '''Method copied from `xml.etree.ElementTree.Element` that is needed in
@@ -197,14 +301,19 @@ or `str` number, not `%s` when changing `text` attribute on 'NSNumber' object" %
     def iter(self, tag: Optional[str] = None) -> Generator[PlistElement, None, None]:
         '''Method copied from `xml.etree.ElementTree.Element` that is needed in
         a class for the `ElementTree.tostring` to work properly. It iterates
-        recursively on `PlistElement` sub-nodes if they exist.'''
+        on `PlistElement` sub-nodes in depth-first order if they exist.'''
 
         if tag == "*":
             tag = None
-        if tag is None or self.tag == tag:
-            yield self
-        for e in self._children:
-            yield from e.iter(tag)
+        # An explicit stack is used instead of recursive generators, so deep
+        # trees do not create a generator for every node
+        stack: List[PlistElement] = [self]
+        while stack:
+            e: PlistElement = stack.pop()
+            if tag is None or e.tag == tag:
+                yield e
+            # Reversed, so the first sub-node is popped first
+            stack.extend(reversed(e._children))
 
     def __getitem__(self, index : Union[int, str]) -> Union[PlistElement]:
         '''`__getitem__` is called on `PlistElement[key]`. It returns a sub-node
@@ -245,11 +354,11 @@ or `str` number, not `%s` when changing `text` attribute on 'NSNumber' object" %
             raise SyntaxError("PlistElement with tag `%s` can't have any nodes" % \
             self.tag)
         if isinstance(index, int):
-            if self.tag in DEFAULT_KEY_IDS['dict']:
+            if self._kind == KIND_DICT:
                 raise ValueError("Can't access to dict nodes by a integer index")
             return self._children[index]
         elif isinstance(index, str):
-            if self.tag in DEFAULT_KEY_IDS['array']:
+            if self._kind == KIND_ARRAY:
                 raise ValueError("Can't access to array nodes by a string key")
             # Get the index of `PlistElement` value that is linked by the string key
             # and return the target `PlistElement` from the subnode list by the index
@@ -289,20 +398,25 @@ or `str` number, not `%s` when changing `text` attribute on 'NSNumber' object" %
         if not isdirectory(self):
             raise SyntaxError("PlistElement with tag `%s` cannot have any nodes")
         if isinstance(index, int):
-            if self.tag in DEFAULT_KEY_IDS['dict']:
+            if self._kind == KIND_DICT:
                 raise ValueError("Cannot access to 'NSDictionary' nodes by int index")
             self._children[index] = value
         elif isinstance(index, str):
-            if self.tag in DEFAULT_KEY_IDS['array']:
+            if self._kind == KIND_ARRAY:
                 raise ValueError("Cannot access to 'NSArray' nodes by a string key")
-            try:
-                self._children[self._dictitems[index]] = value
-            except KeyError:
-                # Create a 'NSKey' and append the value to it
-                self._children.append(PlistElement(DEFAULT_KEY_IDS['key'][0], index))
-                self._children.append(value)
+            dictitems: Dict[str, int] = self._dictitems
+            children: List[PlistElement] = self._children
+            # New keys are the common case while building a tree, so they are
+            # checked with `in` instead of catching a `KeyError`
+            if index in dictitems:
+                children[dictitems[index]] = value
+            else:
+                # Create a 'NSKey' and append the value to it. The tag is read
+                # here since `updatekeys` can change it
+                children.append(PlistElement(DEFAULT_KEY_IDS['key'][0], index))
+                children.append(value)
                 # Link the index of the value to the string key
-                self._dictitems[index] = len(self._children) - 1
+                dictitems[index] = len(children) - 1
         else:
             raise ValueError("`index` input is a `%s`, not `int` or `str`" % type(index))
 
@@ -328,18 +442,19 @@ or `str` number, not `%s` when changing `text` attribute on 'NSNumber' object" %
             `List[PlistElement]` or `Tuple[PlistElement]`
         '''
 
-        if not self.tag in DEFAULT_KEY_IDS['array']:
+        if self._kind != KIND_ARRAY:
             raise SyntaxError("Cannot append elements to a `%s` `PlistElement`" % self.tag)
-        if not isinstance(value, (PlistElement, list, tuple)):
+        # Single elements are appended most of the time, so they are checked
+        # first and appended without wrapping them inside a list
+        if type(value) is PlistElement:     self._children.append(value)
+        elif isinstance(value, (list, tuple)):
             # Simple type checking. I know that you can pass non PlistElement
             # in lists and tuples
+            self._children.extend(value)
+        elif isinstance(value, PlistElement):   self._children.append(value)
+        else:
             raise ValueError("`value` parameter is a type of `%s`, not `PlistElement`, \
 `List[PlistElement]` or `Tuple[PlistElement]`" % type(value))
-        if isinstance(value, PlistElement):
-            # list.extend() can't add a single custom class (bug), so I wrap the
-            # single element inside a list
-            value = [value]
-        self._children.extend(value)
 
     def pop(self, index: Union[int, str]) -> None:
         '''Deletes a sub-node in a 'NSArray'. In a 'NSDictionary' both the key
@@ -364,19 +479,24 @@ or `str` number, not `%s` when changing `text` attribute on 'NSNumber' object" %
         '''
 
         if isinstance(index, int):
-            if not self.tag in DEFAULT_KEY_IDS['array']:
+            if self._kind != KIND_ARRAY:
                 raise ValueError("Cannot delete a child by a integer index in a\
  `%s` `PlistElement`" % self.tag)
             del self._children[index]
         elif isinstance(index, str):
-            if not self.tag in DEFAULT_KEY_IDS['dict']:
+            if self._kind != KIND_DICT:
                 raise ValueError("Cannot delete a dict value in a `%s`\
  PlistElement" % self.tag)
-            # Delete the refered value
-            del self._children[self._dictitems[index]]
-            # Delete the key itself
-            del self._children[self._dictitems[index] - 1]
-            # Delete the infomation about the value index
-            self._dictitems.pop(index)
-
-        else:   raise ValueError('`index` input is not a `int` or `str`')
\ No newline at end of file
+            # Delete the key and the refered value in a single slice
+            dictitems: Dict[str, int] = self._dictitems
+            value_index: int = dictitems.pop(index)
+            del self._children[value_index - 1:value_index + 1]
+            # The values after the deleted pair have moved two positions back
+            for key, i in dictitems.items():
+                if i > value_index:     dictitems[key] = i - 2
+
+        else:   raise ValueError('`index` input is not a `int` or `str`')
+
+# Slots that hold the state of a `PlistElement`
+_STATE_SLOTS: Tuple[str, ...] = tuple(name for name in PlistElement.__slots__
+    if name != '__weakref__')
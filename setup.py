@@ -1,9 +1,22 @@
 from distutils.core import setup
 
+# The compiled modules are optional. `pyplist.convert` falls back to the pure
+# python `todict` loop when it is not built. `pyplist/tree.py` is compiled as
+# a plain python module, the annotations are not used as C types so the
+# behaviour of the pure python version is kept
+try:
+    from Cython.Build import cythonize
+    ext_modules = cythonize('pyplist/_todict.pyx', language_level=3) + \
+        cythonize('pyplist/tree.py', language_level=3,
+            compiler_directives={'annotation_typing': False})
+except ImportError:
+    ext_modules = []
+
 
 setup(
     name='PyPlist', version='0.0.1',
     description='A Python3 library for modifying, editing and creating standard and non-standard property lists',
     author='monoamine11231', author_email='monoamine11231@gmail.com',
-    url='https://github.com/monoamine11231/PyPlist', packages=['pyplist']
-)
\ No newline at end of file
+    url='https://github.com/monoamine11231/PyPlist', packages=['pyplist'],
+    ext_modules=ext_modules
+)
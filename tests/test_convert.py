@@ -8,10 +8,50 @@ def test_fromstring() -> None:
     root: src.tree.PlistElement = src.convert.fromstring(
         '<dict><key>2</key><array><integer>5</integer><string>test</string></array></dict>')
     assert(root['2'][1].text == 'test' and root['2'][1].tag == 'string')
+    # The reused parser of the thread does not keep the parsed tree
+    assert(src.convert._parser()._orderelementlist == [])
+
+def test_fromstring_invalid() -> None:
+    with pytest.raises(SyntaxError):
+        src.convert.fromstring('<dict><key>a</key>')
+    assert(src.convert._parser()._orderelementlist == [])
 
 def test_fromfile() -> None:
     root: src.tree.PlistElement = src.convert.fromfile('tests/valid_plist')
     assert(root['a'][2].tag == 'date' and root['a'][2].text == '2012-01-02')
+    assert(src.convert._parser()._orderelementlist == [])
+
+_TODICT_PLIST: str = '''<plist><dict><key>i</key><integer>1</integer>
+<key>f</key><real>1.5</real><key>d</key><date>2012-01-02</date>
+<key>t</key><true/><key>s</key><string>text</string>
+<key>a</key><array><false/><data>dGVzdA==</data><dict/><array/></array>
+</dict></plist>'''
+
+@pytest.mark.parametrize('compiled', [False, True])
+def test_todict_implementations(monkeypatch: pytest.MonkeyPatch, compiled: bool) -> None:
+    # The pure python loop and the compiled extension must give the same results
+    ctodict = pytest.importorskip('src._todict').todict if compiled else None
+    monkeypatch.setattr(src.convert, '_ctodict', ctodict)
+    root: src.tree.PlistElement = src.convert.fromstring(_TODICT_PLIST)
+    expected: dict = {'i': 1, 'f': 1.5, 'd': date(2012, 1, 2), 't': True,
+        's': 'text', 'a': [False, 'dGVzdA==', {}, []]}
+    assert(src.convert.todict(root) == expected)
+    expected['a'][1] = b'test'
+    assert(src.convert.todict(root, decode_data=True) == expected)
+    assert(src.convert.todict(src.tree.PlistElement('string', 'x')) == ['x'])
+
+    # Typed values from `fromdict` are returned without a string round trip
+    typed: dict = {'i': 2, 'f': 2.5, 'd': date(2012, 1, 2), 'b': b'test'}
+    typedroot: src.tree.PlistElement = src.convert.fromdict(typed)
+    assert(src.convert.todict(typedroot, decode_data=True) == typed)
+    assert(all(e._text is None for e in typedroot if e.tag != 'key'))
+    assert(src.convert.todict(typedroot)['b'] == 'dGVzdA==')
+
+    # Invalid nested 'NSDictionary' objects are only detected when validating
+    root['a'][2]._children.append(src.tree.PlistElement('key', 'unlinked'))
+    with pytest.raises(AssertionError):
+        src.convert.todict(root)
+    assert(src.convert.todict(root, validate_dicts=False)['a'][2] == {})
 
 def test_todict() -> None:
     root: src.tree.PlistElement = src.tree.PlistElement('dict')
@@ -62,6 +102,18 @@ def test_todict() -> None:
         src.tree.PlistElement('string', 'some_text')) == ['some_text']
     )
 
+    # Deep trees should not hit the recursion limit
+    deep_root: src.tree.PlistElement = src.tree.PlistElement('array')
+    node = deep_root
+    for _ in range(5000):
+        node.append(src.tree.PlistElement('array'))
+        node = node[0]
+    node.append(src.tree.PlistElement('integer', 1))
+    deep_dicted = src.convert.todict(deep_root)
+    for _ in range(5000):
+        deep_dicted = deep_dicted[0]
+    assert(deep_dicted == [1])
+
 def test_tostring() -> None:
     test_element: src.tree.PlistElement = src.tree.PlistElement('dict')
     test_element['test_key1'] = src.tree.PlistElement('integer', 3)
@@ -106,6 +158,14 @@ def test_fromdict() -> None:
     assert(plist_list[5].text == 'AAEC' and plist_list[5].tag == 'data')
     assert(plist_list[6]['test_key1'].tag == 'true')
 
+    # Test subclasses of supported types
+    class SubInt(int): pass
+    class SubDict(dict): pass
+    plist_sub: src.tree.PlistElement = src.convert.fromdict(
+        [SubInt(3), SubDict({'test_key1': 'text'})])
+    assert(plist_sub[0].text == '3' and plist_sub[0].tag == 'integer')
+    assert(plist_sub[1]['test_key1'].text == 'text')
+
     # Test exceptions
     with pytest.raises(ValueError):
         src.convert.fromdict({'test_key1': None})
@@ -1,9 +1,25 @@
+import copy
 import src.namespace
 
 def test_updatekeys() -> None:
-    src.namespace.updatekeys({'int': ['intager', 'integer', 'int']})
-    assert(src.namespace.DEFAULT_KEY_IDS['int'] == ['intager', 'integer', 'int'])
-    assert('intager' in src.namespace.DEFAULT_KEYS)
-    assert('int' in src.namespace.DEFAULT_KEYS)
-    # Test if non affected keys have been changed in some way
-    assert('key' in src.namespace.DEFAULT_KEY_IDS['key'])
\ No newline at end of file
+    # The namespace is restored, so other test modules see the default tags
+    saved: dict = copy.deepcopy(src.namespace.DEFAULT_KEY_IDS)
+    try:
+        src.namespace.updatekeys({'int': ['intager', 'integer', 'int']})
+        assert(src.namespace.DEFAULT_KEY_IDS['int'] == ['intager', 'integer', 'int'])
+        assert('intager' in src.namespace.DEFAULT_KEYS)
+        assert('int' in src.namespace.DEFAULT_KEYS)
+        # Test if non affected keys have been changed in some way
+        assert('key' in src.namespace.DEFAULT_KEY_IDS['key'])
+        # Check if the reverse tag map has been rebuilt
+        assert(src.namespace.TAG_KIND['intager'] == src.namespace.KIND_INT)
+        assert(src.namespace.TAG_KIND['key'] == src.namespace.KIND_KEY)
+        # Check if the tags used for new objects follow the namespace
+        src.namespace.updatekeys({'true': ['yes', 'true']})
+        assert(src.namespace.CANON_BOOL[True] == 'yes')
+        assert(src.namespace.CANON_BY_TYPE[int] == 'intager')
+    finally:
+        src.namespace.updatekeys(saved)
+    assert(src.namespace.DEFAULT_KEY_IDS == saved)
+    assert(not 'intager' in src.namespace.TAG_KIND)
+    assert(src.namespace.CANON_BY_TYPE[int] == 'integer')
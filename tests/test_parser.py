@@ -2,6 +2,10 @@
 import pytest
 import src.parser, src.tree, src.namespace
 from datetime import date
+from base64 import b64decode
+import plistlib
+import io
+from typing import Any, Iterator, List, Tuple
 
 
 def test__dicterror() -> None:
@@ -24,7 +28,9 @@ def test__dicterror() -> None:
 def test__dictattrstoxml() -> None:
     assert(src.parser._dictattrstoxml({}) == '')
     assert(src.parser._dictattrstoxml({'abc' : "'test", 'def': 'ab"c'})
-        == ' abc="\'test" def="ab\\\"c"')
+        == ' abc="\'test" def=\'ab"c\'')
+    assert(src.parser._dictattrstoxml({'abc' : '<"\'&>'})
+        == ' abc="&lt;&quot;\'&amp;&gt;"')
 
 
 def test_PlistXML_init() -> None:
@@ -32,13 +38,54 @@ def test_PlistXML_init() -> None:
     assert(not test_init._parser == None)
     assert(not test_init._orderelementlist == None)
 
+def test_PlistXML_reset() -> None:
+    parser: src.parser.PlistXML = src.parser.PlistXML()
+    first: src.tree.PlistElement = parser.parse('<plist><array/></plist>')
+    # The same parser object should return the new root
+    second: src.tree.PlistElement = parser.parse('<plist><dict/></plist>')
+    assert(first.tag == 'array' and second.tag == 'dict')
+    parser.reset()
+    assert(parser._orderelementlist == [])
+
 def test_PlistXML_parse() -> None:
-    test_plist: str = '''<plist><dict><key>k1</key><int>2</int></dict></plist>'''
+    test_plist: str = '''<plist><dict><key>k1</key><integer>2</integer></dict></plist>'''
     with pytest.raises(SyntaxError):
         src.parser.PlistXML().parse('invalid_plist_xml')
     root: src.tree.PlistElement = src.parser.PlistXML().parse(test_plist)
     assert(root.tag == 'dict')
-    assert(root['k1'].tag == 'int' and root['k1'].text == '2')
+    assert(root['k1'].tag == 'integer' and root['k1'].text == '2')
+
+    # Strings that are longer than the parser buffer are fed in chunks
+    long_plist: str = '<plist><array>%s</array></plist>' % \
+        ('<string>test</string>' * src.parser._BUFFER_SIZE)
+    root = src.parser.PlistXML().parse(long_plist)
+    assert(len(root) == src.parser._BUFFER_SIZE and root[-1].text == 'test')
+
+    # Every key should be linked to the index right after it
+    dict_plist: str = '<plist><dict>%s</dict></plist>' % ''.join(
+        '<key>k%d</key><integer>%d</integer>' % (i, i) for i in range(1000))
+    root = src.parser.PlistXML().parse(dict_plist)
+    assert(all(root._dictitems['k%d' % i] == 2 * i + 1 for i in range(1000)))
+    assert(root['k999'].text == '999')
+
+    # Non-directory objects cannot contain sub-nodes
+    with pytest.raises(SyntaxError):
+        src.parser.PlistXML().parse('<plist><array><integer>1<string>x</string>'
+            '</integer></array></plist>')
+    with pytest.raises(SyntaxError):
+        src.parser.PlistXML().parse('<plist><string><key>a</key>hello</string></plist>')
+    # A non-directory root cannot be followed by a sibling
+    for sibling in ('<string>b</string>', '<dict/>'):
+        with pytest.raises(SyntaxError):
+            src.parser.PlistXML().parse('<plist><string>a</string>%s</plist>' % sibling)
+    # A closed directory root cannot be followed by a second root
+    for sibling in ('<string>b</string>', '<dict/>'):
+        with pytest.raises(SyntaxError):
+            src.parser.PlistXML().parse('<plist><dict/>%s</plist>' % sibling)
+
+    # `plistlib` wraps long 'NSData' objects across indented lines
+    root = src.parser.PlistXML().parse(plistlib.dumps({'a': b'x' * 100}).decode())
+    assert(b64decode(root['a'].text) == b'x' * 100)
 
 def test_PlistXML_parsefile() -> None:
     with pytest.raises(SyntaxError):
@@ -46,11 +93,31 @@ def test_PlistXML_parsefile() -> None:
     root: src.tree.PlistElement = src.parser.PlistXML().parsefile('tests/valid_plist')
     assert(root.tag == 'dict' and root['a'][2].text == '2012-01-02')
 
+def test_PlistXML__events() -> None:
+    etree = pytest.importorskip('lxml.etree')
+    parser: src.parser.PlistXML = src.parser.PlistXML()
+    parser._validate_dicts = True
+    source: io.BytesIO = io.BytesIO(b'<plist><array>%s</array></plist>' %
+        (b'<string>a</string>' * 100))
+    previous: List[Any] = []
+    def events() -> Iterator[Tuple[str, Any]]:
+        for event, elem in etree.iterparse(source, events=src.parser._EVENTS):
+            yield event, elem
+            # The closed siblings before the current element have been removed
+            if event == 'end' and elem.tag == 'string':
+                previous.append(elem.getprevious())
+    parser._events(events())
+    assert(previous == [None] * 100)
+    assert(len(parser._orderelementlist[0]) == 100)
+
 def test_PlistXML__start() -> None:
     parser: src.parser.PlistXML = src.parser.PlistXML()
     parser._start('plist', {})
     # Check if `plist` object is being ignored
     assert(parser._orderelementlist == [])
+    parser._start('key', {})
+    # Non-directory objects are created when they are closed
+    assert(parser._orderelementlist == [])
 
     parser._start('dict', {'one': '1'})
     # Check if attributes and tag name are being passed to the PlistElement object
@@ -65,42 +132,80 @@ def test_PlistXML__end() -> None:
         unvalid_dict._children.append(src.tree.PlistElement('key', 'test'))
         parser._orderelementlist.append(unvalid_dict)
         parser._validate_dicts = True
-        parser._end('dict')
+        parser._end('dict', {}, None)
 
     parser: src.parser.PlistXML = src.parser.PlistXML()
     parser._validate_dicts = True
+    parser._end('plist', {}, None)
+    # Check if `plist` object is being ignored
+    assert(parser._orderelementlist == [])
+
     # Create a 'NSDictionary' and fill it
     target: src.tree.PlistElement = src.tree.PlistElement('dict')
     target['k1'] = src.tree.PlistElement('integer', 2)
     parser._orderelementlist.append(target)
-    parser._end('dict')
+    parser._end('dict', {}, '\n\t')
     # See if there are changes to the root object. `_end` method should not
     # change the root object if it is the only element in the ordered list.
-    assert(parser._orderelementlist[-1] == target)
+    assert(parser._orderelementlist == [target])
+    # Every element after the closed root is a second root
+    with pytest.raises(SyntaxError):
+        parser._start('dict', {})
+    with pytest.raises(SyntaxError):
+        parser._end('integer', {}, '3')
+    # The closing `plist` tag is still accepted
+    parser._end('plist', {}, None)
 
-    parser._orderelementlist.append(src.tree.PlistElement('key', 'empty_key'))
-    parser._end('key')
+    # Keep the root open and fill it
+    parser.reset()
+    parser._orderelementlist.append(target)
+    parser._end('key', {'one': '1'}, 'empty_key')
+    # Non-directory objects are appended directly to the open directory node
+    assert(parser._orderelementlist == [target])
+    assert(target._children[-1].tag == 'key' \
+        and target._children[-1].attrib == {'one': '1'})
     # Check if the linked value index of the `empty_key` is one larger than the
     # index of the actual 'NSKey' element
-    assert(parser._orderelementlist[-1]._dictitems['empty_key'] == 3)
+    assert(target._dictitems['empty_key'] == 3)
 
-def test_PlistXML__data() -> None:
-    with pytest.raises(ValueError):
-        parser: src.parser.PlistXML = src.parser.PlistXML()
-        unvalid_data: src.tree.PlistElement = src.tree.PlistElement('data', parsedobj=True)
-        parser._orderelementlist.append(unvalid_data)
-        parser._data('not_valid_base64')
+    # Closed directory nodes are appended to their parent
+    parser._start('array', {})
+    parser._end('integer', {}, '3')
+    parser._end('array', {}, None)
+    assert(parser._orderelementlist == [target] and target['empty_key'][0].text == '3')
 
+def test_PlistXML__end_text() -> None:
     parser: src.parser.PlistXML = src.parser.PlistXML()
+    parser._validate_dicts = True
+    with pytest.raises(ValueError):
+        parser._end('data', {}, 'not_valid_base64')
+    with pytest.raises(SyntaxError):
+        parser._end('string', {}, 'text', 1)
+    with pytest.raises(SyntaxError):
+        parser._start('array', {})
+        parser._end('array', {}, 'not_formatting')
+
+    parser = src.parser.PlistXML()
+    parser._validate_dicts = True
+    parser._start('array', {})
+    target: src.tree.PlistElement = parser._orderelementlist[0]
     # Test 'NSDate' objects
-    parser._orderelementlist.append(src.tree.PlistElement('date', parsedobj=True))
-    parser._data('2012-01-02')
-    assert(parser._orderelementlist[0].text == '2012-01-02')
+    parser._end('date', {}, '\n\t2012-01-02\n')
+    assert(target[-1].text == '2012-01-02')
     # Test 'NSData' objects
-    parser._orderelementlist[0] = src.tree.PlistElement('data', parsedobj=True)
-    parser._data('dGVzdF9zdHJpbmc=')
-    assert(parser._orderelementlist[0].text == 'dGVzdF9zdHJpbmc=')
+    parser._end('data', {}, 'dGVzdF9zdHJpbmc=')
+    assert(target[-1].text == 'dGVzdF9zdHJpbmc=')
+    # Whitespace inside wrapped base64 strings is removed
+    parser._end('data', {}, '\n\tdGVzdF9z\n\tdHJpbmc=\n')
+    assert(target[-1].text == 'dGVzdF9zdHJpbmc=')
     # Test non-'NSData' and non-'NSDate' objects
-    parser._orderelementlist[0] = src.tree.PlistElement('integer', parsedobj=True)
-    parser._data('2')
-    assert(parser._orderelementlist[0].text == '2')
+    parser._end('integer', {}, '2')
+    assert(target[-1].text == '2')
+    parser._end('real', {}, ' 2.5\n')
+    assert(target[-1].text == '2.5')
+    # Whitespace-only text should be ignored
+    parser._end('string', {}, '\n\t ')
+    assert(target[-1].text == '')
+    # Formatting between sub-nodes should be ignored
+    parser._end('array', {}, '\n\t')
+    assert(parser._orderelementlist == [target] and target.text == '')
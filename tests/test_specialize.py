@@ -0,0 +1,36 @@
+# type: ignore
+import pytest
+import src.convert, src.specialize, src.tree
+from datetime import date
+
+
+def test_compile_todict() -> None:
+    root: src.tree.PlistElement = src.convert.fromstring(
+        '<dict><key>count</key><integer>2</integer><key>name</key>'
+        '<string>test</string><key>items</key><array><dict><key>on</key><true/>'
+        '<key>at</key><date>2012-01-02</date><key>raw</key><data>dGVzdA==</data>'
+        '</dict></array><key>ignored</key><real>1.5</real></dict>')
+    specialized = src.specialize.compile_todict({
+        'name': str, 'count': int,
+        'items': [{'on': bool, 'at': date, 'raw': bytes}]
+    })
+    assert(specialized(root) == {
+        'name': 'test', 'count': 2,
+        'items': [{'on': True, 'at': date(2012, 1, 2), 'raw': b'test'}]
+    })
+    assert(src.specialize.compile_todict([float])(
+        src.convert.fromdict([1.5, 2.0])) == [1.5, 2.0])
+
+    # Missing keys are not validated
+    with pytest.raises(KeyError):
+        src.specialize.compile_todict({'missing': int})(root)
+
+    # Test exceptions
+    with pytest.raises(ValueError):
+        src.specialize.compile_todict({'key': None})
+    with pytest.raises(ValueError):
+        src.specialize.compile_todict({1: int})
+    with pytest.raises(ValueError):
+        src.specialize.compile_todict([int, str])
+    with pytest.raises(ValueError):
+        src.specialize.compile_todict(int)
@@ -1,104 +1,195 @@
 # type: ignore
 
 import pytest
-import src.tree
-import datetime
-from collections import abc
+import src.tree, src.namespace
+from datetime import date, datetime
+from collections.abc import Iterator, ItemsView
+from typing import Any, Callable, Type
+import copy, pickle, weakref
+
+# Values of a wrong type for the parameters under test. They are never changed
+_BAD_BYTES1: bytearray = bytearray(1)
+_BAD_BYTES12: bytearray = bytearray(12)
+# 'NSData' input and its base64 text
+_DATA_IN: bytes = b'test_bytes'
+_DATA_B64: str = 'dGVzdF9ieXRlcw=='
+# Initial 'NSDate' value. It differs from the values that are set later
+_FIXED_DATE: date = date(2000, 1, 1)
+# Returned by `next` when an iterator is exhausted
+_SENTINEL: object = object()
+
+# Elements that are only read by the tests are created once per module. Tests
+# that change sub-nodes create their own elements
+@pytest.fixture(scope='module')
+def true_element() -> src.tree.PlistElement:
+    return src.tree.PlistElement('true')
+
+@pytest.fixture(scope='module')
+def false_element() -> src.tree.PlistElement:
+    return src.tree.PlistElement('false')
+
+@pytest.fixture(scope='module')
+def key_element() -> src.tree.PlistElement:
+    return src.tree.PlistElement('key', 'test')
+
+@pytest.fixture(scope='module')
+def dict_element() -> src.tree.PlistElement:
+    return src.tree.PlistElement('dict')
+
+@pytest.fixture(scope='module')
+def array_element() -> src.tree.PlistElement:
+    return src.tree.PlistElement('array')
 
 def test_dateobj() -> None:
     datettime_str: str = '2020-07-26T21:27:49.012728'
     date_str: str = '2020-07-26'
 
-    assert(type(src.tree.dateobj(datettime_str)) == datetime.datetime)
-    assert(type(src.tree.dateobj(date_str)) == datetime.date)
+    assert(type(src.tree.dateobj(datettime_str)) == datetime)
+    assert(type(src.tree.dateobj(date_str)) == date)
+    # Repeated dates should be read from the cache
+    hits: int = src.tree.dateobj.cache_info().hits
+    assert(src.tree.dateobj(date_str) == date(2020, 7, 26))
+    assert(src.tree.dateobj.cache_info().hits == hits + 1)
 
-def test_isbool() -> None:
-    assert(src.tree.isbool(src.tree.PlistElement('true')))
-    assert(src.tree.isbool(src.tree.PlistElement('false')))
-    assert(not src.tree.isbool(src.tree.PlistElement('key', 'test')))
+def test_isbool(true_element: src.tree.PlistElement,
+    false_element: src.tree.PlistElement,
+    key_element: src.tree.PlistElement) -> None:
+    assert(src.tree.isbool(true_element))
+    assert(src.tree.isbool(false_element))
+    assert(not src.tree.isbool(key_element))
 
-def test_isdirectory() -> None:
-    assert(src.tree.isdirectory(src.tree.PlistElement('dict')))
-    assert(src.tree.isdirectory(src.tree.PlistElement('array')))
-    assert(not src.tree.isdirectory(src.tree.PlistElement('true')))
+def test_isdirectory(dict_element: src.tree.PlistElement,
+    array_element: src.tree.PlistElement,
+    true_element: src.tree.PlistElement) -> None:
+    assert(src.tree.isdirectory(dict_element))
+    assert(src.tree.isdirectory(array_element))
+    assert(not src.tree.isdirectory(true_element))
 
 
 def test_PlistElement_init() -> None:
     with pytest.raises(ValueError):
         src.tree.PlistElement('non_existing_tag')
     with pytest.raises(ValueError):
-        src.tree.PlistElement('key', 'text', bytearray(12))
+        src.tree.PlistElement('key', 'text', _BAD_BYTES12)
 
     assert(src.tree.PlistElement('dict').tag == 'dict')
+    assert(src.tree.PlistElement('dict')._kind == src.namespace.KIND_DICT)
     assert(src.tree.PlistElement('key', 'test_text', parsedobj=True).text
         == '')
-
-def test_PlistElement_setattr() -> None:
-    dict_element: src.tree.PlistElement = src.tree.PlistElement('dict')
-    true_element: src.tree.PlistElement = src.tree.PlistElement('true')
+    assert(src.tree.PlistElement('string').tail == '')
+    # Elements created without `attribs` must not share an `attrib` dict
+    assert(src.tree.PlistElement('string').attrib is not
+        src.tree.PlistElement('string').attrib)
+    assert(not hasattr(src.tree.PlistElement('string'), '__dict__'))
+
+@pytest.mark.parametrize('duplicate', [copy.copy, copy.deepcopy,
+    lambda e: pickle.loads(pickle.dumps(e))])
+def test_PlistElement_copy(duplicate: Callable[[Any], Any]) -> None:
+    element: src.tree.PlistElement = src.tree.PlistElement('dict', attribs={'a': '1'})
+    element['k'] = src.tree.PlistElement('date', date(2020, 1, 1))
+    duplicated: src.tree.PlistElement = duplicate(element)
+    assert(duplicated is not element and duplicated.tag == 'dict')
+    assert(duplicated._kind == src.namespace.KIND_DICT)
+    assert(duplicated.attrib == {'a': '1'} and duplicated._dictitems == {'k': 1})
+    assert(duplicated['k'].text == '2020-01-01')
+
+def test_PlistElement_weakref() -> None:
+    element: src.tree.PlistElement = src.tree.PlistElement('string', 'text')
+    assert(weakref.ref(element)() is element)
+
+@pytest.mark.parametrize('tag', ['dict', 'array', 'true', 'false'])
+def test_PlistElement_setattr_notext(tag: str) -> None:
+    element: src.tree.PlistElement = src.tree.PlistElement(tag)
     with pytest.raises(SyntaxError):
-        dict_element.text = 'test_value'
-        true_element.text = 'test_value'
+        element.text = 'test_value'
     # Should not raise any errors if the value is a empty string
-    dict_element.text = ''
-    true_element.text = ''
+    element.text = ''
 
-    # PlistElement.__init__ calls __setattr__ method
+# PlistElement.__init__ calls __setattr__ method
+@pytest.mark.parametrize('tag,init,new,expected', [
     # NSDate
-    date_element: src.tree.PlistElement = src.tree.PlistElement('date', datetime.date.today())
-    with pytest.raises(ValueError):
-        date_element.text = 'not_a_datetime.date_obj'
-
-    date_element.text = datetime.date(2020, 1, 1)
-    assert(date_element.text == '2020-01-01')
-
-    date_element.text = datetime.datetime(2020, 1, 1, 1, 1, 1, 1)
-    assert(date_element.text == '2020-01-01T01:01:01.000001')
-
+    ('date', _FIXED_DATE, date(2020, 1, 1), '2020-01-01'),
+    ('date', _FIXED_DATE, datetime(2020, 1, 1, 1, 1, 1, 1),
+        '2020-01-01T01:01:01.000001'),
     # NSNumber
-    float_element: src.tree.PlistElement = src.tree.PlistElement('real', 12.1)
-    with pytest.raises(ValueError):
-        float_element.text = 'not_a_string_number'
-
-    # Coverage.py bug that doesn't detect two syntax errors in one `pytest.raises`
-    # scope.
-    with pytest.raises(ValueError):
-        float_element.text = bytearray(1)
-    float_element.text = '12'
-    assert(float_element.text == '12')
-
+    ('real', 12.1, '12', '12'),
+    # `int` values too large for a `float` are valid numbers
+    ('real', 12.1, 10 ** 400, str(10 ** 400)),
     # NSData
-    data_element: src.tree.PlistElement = src.tree.PlistElement('data', b'test_bytes')
+    ('data', b'', _DATA_IN, _DATA_B64),
+])
+def test_PlistElement_setattr(tag: str, init: object, new: object,
+    expected: str) -> None:
+    element: src.tree.PlistElement = src.tree.PlistElement(tag, init)
+    element.text = new
+    assert(element.text == expected)
+
+@pytest.mark.parametrize('tag,init,new', [
+    ('date', _FIXED_DATE, 'not_a_datetime.date_obj'),
+    ('real', 12.1, 'not_a_string_number'),
+    ('real', 12.1, _BAD_BYTES1),
+    ('data', _DATA_IN, 'simple_string_and_not_bytes'),
+])
+def test_PlistElement_setattr_raises(tag: str, init: object, new: object) -> None:
+    element: src.tree.PlistElement = src.tree.PlistElement(tag, init)
     with pytest.raises(ValueError):
-        data_element.text = 'simple_string_and_not_bytes'
-    data_element.text = b'test_bytes'
-    assert(data_element.text == 'dGVzdF9ieXRlcw==')
+        element.text = new
+
+def test_PlistElement_setattr_lazy() -> None:
+    # Every kind must have an entry in the validator jump table
+    assert(len(src.tree._TEXT_VALIDATORS) == len(src.namespace.KIND_NAMES))
+    # Typed values are converted when `text` is read and a copy of a changed
+    # `bytearray` is kept
+    source: bytearray = bytearray(_DATA_IN)
+    data_element: src.tree.PlistElement = src.tree.PlistElement('data', source)
+    source[0] = 0
+    assert(data_element._text is None and data_element._raw_text == _DATA_IN)
+    assert(data_element.text == _DATA_B64 and data_element._text == data_element.text)
 
     # Check if trying to change the tag
     with pytest.raises(AttributeError):
         src.tree.PlistElement('dict').tag = 'key'
 
-def test_PlistElement_repr() -> None:
-    assert(src.tree.PlistElement('true').__repr__().index('<PlistElement') == 0)
+def test_PlistElement_repr(true_element: src.tree.PlistElement) -> None:
+    assert(true_element.__repr__().index('<PlistElement') == 0)
 
-def test_PlistElement_len() -> None:
-    assert(len(src.tree.PlistElement('array')) == 0)
+def test_PlistElement_len(array_element: src.tree.PlistElement,
+    key_element: src.tree.PlistElement) -> None:
+    assert(len(array_element) == 0)
+    # Non-directory nodes do not allocate sub-node containers
+    assert(len(key_element) == 0 and list(key_element) == [])
+    assert(key_element._dictitems is None)
 
-def test_PlistElement__iter_() -> None:
-    assert(issubclass(type(src.tree.PlistElement('dict').__iter__()), abc.Generator))
+def test_PlistElement__iter_(dict_element: src.tree.PlistElement) -> None:
+    assert(isinstance(dict_element.__iter__(), Iterator))
 
-def test_PlistElement_items() -> None:
-    assert(issubclass(type(src.tree.PlistElement('dict').items()), abc.ItemsView))
+def test_PlistElement_items(dict_element: src.tree.PlistElement) -> None:
+    assert(isinstance(dict_element.items(), ItemsView))
 
 def test_PlistElement_iter() -> None:
     test_element: src.tree.PlistElement = src.tree.PlistElement('array')
-    assert(list(test_element.iter('*')) == [test_element])
-    assert(list(test_element.iter()) == [test_element])
+    for matches in (test_element.iter('*'), test_element.iter()):
+        assert(next(matches) is test_element)
+        assert(next(matches, _SENTINEL) is _SENTINEL)
 
     # PlistElement.append() should be used. This is for unit testing purposes only
     appended_element: src.tree.PlistElement = src.tree.PlistElement('key', 'test')
     test_element._children.append(appended_element)
-    assert(list(test_element.iter('key')) == [appended_element])
+    matches = test_element.iter('key')
+    assert(next(matches) is appended_element)
+    assert(next(matches, _SENTINEL) is _SENTINEL)
+
+    # Sub-nodes are visited in depth-first pre-order, also in deep trees
+    nested_element: src.tree.PlistElement = src.tree.PlistElement('array')
+    nested_element.append(src.tree.PlistElement('key', 'nested'))
+    test_element._children.insert(0, nested_element)
+    assert([e.text for e in test_element.iter('key')] == ['nested', 'test'])
+    deep_element: src.tree.PlistElement = src.tree.PlistElement('array')
+    for _ in range(5000):
+        parent_element: src.tree.PlistElement = src.tree.PlistElement('array')
+        parent_element.append(deep_element)
+        deep_element = parent_element
+    assert(len(list(deep_element.iter('array'))) == 5001)
 
 def test_PlistElement_getitem() -> None:
     append_element1: src.tree.PlistElement = src.tree.PlistElement('true')
@@ -113,17 +204,19 @@ def test_PlistElement_getitem() -> None:
     # unit testing purposes
     dict_element['test'] = append_element2
 
-    with pytest.raises(SyntaxError):
-        src.tree.PlistElement('key')[0]
-    with pytest.raises(ValueError):
-        dict_element[0]
-    with pytest.raises(ValueError):
-        array_element['key']
     assert(array_element[0] == append_element1)
     assert(dict_element['test'] == append_element2)
 
-    with pytest.raises(ValueError):
-        array_element[bytearray(1)]
+@pytest.mark.parametrize('op,exc', [
+    (lambda d, a: src.tree.PlistElement('key')[0], SyntaxError),
+    (lambda d, a: d[0], ValueError),
+    (lambda d, a: a['key'], ValueError),
+    (lambda d, a: a[_BAD_BYTES1], ValueError),
+])
+def test_PlistElement_getitem_raises(op: Callable[[src.tree.PlistElement,
+    src.tree.PlistElement], Any], exc: Type[Exception]) -> None:
+    with pytest.raises(exc):
+        op(src.tree.PlistElement('dict'), src.tree.PlistElement('array'))
 
 def test_PlistElement_setitem() -> None:
     append_element1: src.tree.PlistElement = src.tree.PlistElement('true')
@@ -134,12 +227,6 @@ def test_PlistElement_setitem() -> None:
     # unit testing purposes
     array_element._children.append(append_element1)
 
-    with pytest.raises(SyntaxError):
-        src.tree.PlistElement('key', 'test')[0] = None
-    with pytest.raises(ValueError):
-        dict_element[0] = None
-    with pytest.raises(ValueError):
-        array_element['key'] = None
     array_element[0] = append_element2
     assert(array_element._children[0] == append_element2)
 
@@ -149,8 +236,20 @@ def test_PlistElement_setitem() -> None:
     # Key name needs to point to the value index in the ordered list
     assert(dict_element._dictitems['key1'] == 1)
 
-    with pytest.raises(ValueError):
-        array_element[bytearray(1)] = append_element1
+def _setitem(element: src.tree.PlistElement, index: Any, value: Any) -> None:
+    element[index] = value
+
+@pytest.mark.parametrize('op,exc', [
+    (lambda d, a: _setitem(src.tree.PlistElement('key', 'test'), 0, None),
+        SyntaxError),
+    (lambda d, a: _setitem(d, 0, None), ValueError),
+    (lambda d, a: _setitem(a, 'key', None), ValueError),
+    (lambda d, a: _setitem(a, _BAD_BYTES1, None), ValueError),
+])
+def test_PlistElement_setitem_raises(op: Callable[[src.tree.PlistElement,
+    src.tree.PlistElement], Any], exc: Type[Exception]) -> None:
+    with pytest.raises(exc):
+        op(src.tree.PlistElement('dict'), src.tree.PlistElement('array'))
 
 def test_PlistElement_append() -> None:
     array_element: src.tree.PlistElement = src.tree.PlistElement('array')
@@ -162,26 +261,41 @@ def test_PlistElement_append() -> None:
     array_element.append(append_element)
     assert(array_element._children[0] == append_element)
 
-def test_PlistElement_pop() -> None:
-    append_element1: src.tree.PlistElement = src.tree.PlistElement('true')
-    append_element2: src.tree.PlistElement = src.tree.PlistElement('false')
+def test_PlistElement_pop(true_element: src.tree.PlistElement,
+    false_element: src.tree.PlistElement,
+    key_element: src.tree.PlistElement) -> None:
+    # The shared leaf elements are only linked into the new directories
     dict_element: src.tree.PlistElement = src.tree.PlistElement('dict')
     array_element: src.tree.PlistElement = src.tree.PlistElement('array')
 
-    with pytest.raises(ValueError):
-        dict_element.pop(0)
-    array_element._children.append(append_element1)
+    array_element._children.append(true_element)
     array_element.pop(0)
     assert(array_element._children == [])
 
-    with pytest.raises(ValueError):
-        array_element.pop('key')
-    key_element: src.tree.PlistElement = src.tree.PlistElement('key', 'test')
     dict_element['test'] = key_element
     dict_element.pop('test')
-    assert(not append_element2 in dict_element._children)
     assert(not key_element in dict_element._children)
     assert(not 'test' in dict_element._dictitems)
 
-    with pytest.raises(ValueError):
-        array_element.pop(bytearray(1))
+    # Values after the removed pair must still be found by their keys
+    dict_element['first'] = true_element
+    dict_element['second'] = false_element
+    dict_element.pop('first')
+    assert(dict_element['second'] is false_element)
+    assert(dict_element._dictitems == {'second': 1})
+    # Only the values after the removed pair are moved
+    dict_element['third'] = true_element
+    dict_element['fourth'] = key_element
+    dict_element.pop('third')
+    assert(dict_element._dictitems == {'second': 1, 'fourth': 3})
+    assert(dict_element['fourth'] is key_element)
+
+@pytest.mark.parametrize('op,exc', [
+    (lambda d, a: d.pop(0), ValueError),
+    (lambda d, a: a.pop('key'), ValueError),
+    (lambda d, a: a.pop(_BAD_BYTES1), ValueError),
+])
+def test_PlistElement_pop_raises(op: Callable[[src.tree.PlistElement,
+    src.tree.PlistElement], Any], exc: Type[Exception]) -> None:
+    with pytest.raises(exc):
+        op(src.tree.PlistElement('dict'), src.tree.PlistElement('array'))